@@ -10,6 +10,7 @@ from workers import MsgWorker
 from message import MakeMessage
 from multiprocessing import Queue, JoinableQueue, cpu_count
 from smtp import SMTPHandler
+from validators import parse_address, RecipientValidator
 
 
 def terminate_workers(processes_list):
@@ -21,6 +22,20 @@ def terminate_workers(processes_list):
             logging.debug("Process {0} won't be killed, because is already dead".format(proc.name))
 
 
+def open_session(session, smtp):
+    if not session.connect():
+        logging.critical("Unable to connect any {0} MX server, exiting..".format(smtp['domain']))
+        return False
+
+    if smtp['password']:
+        if not session.authorize(smtp['username'], smtp['password']):
+            logging.critical("Cannot authorize user, maybe wrong password?")
+            session.close()
+            return False
+
+    return True
+
+
 def main():
     def sigint_handler(signal, frame):
         sys.exit(0)
@@ -41,6 +56,10 @@ def main():
     arg_parser.add_argument("-v", "--verbosity", action="count", default=0, help="increase output verbosity")
     arg_parser.add_argument("-c", "--content", help="Message content")
     arg_parser.add_argument("--bcc", action="store_true", help="blind carbon copy")
+    arg_parser.add_argument("--preflight", action="store_true",
+                            help="Drop recipients whose domains have no MX records before sending")
+    arg_parser.add_argument("--probe", action="store_true",
+                            help="Also probe recipients on the relay with RCPT TO (implies --preflight)")
 
     args = arg_parser.parse_args()
 
@@ -59,46 +78,23 @@ def main():
     # checking arg 'from' correctness
     if len(args.from_.split(',')) > 1:
         arg_parser.error('At most one sender required')
-    elif not args.from_.count('@'):
-        arg_parser.error('Wrong "From" address')
-    elif not args.from_.count('<') and args.from_.count(' '):
-        arg_parser.error('Wrong "From" address format')
-    elif args.from_.count('<') and not args.from_.count('>'):
-        arg_parser.error('Wrong "From" address format')
-    elif args.from_.count('>') and not args.from_.count('<'):
-        arg_parser.error('Wrong "From" address format')
 
-    # checking arg 'to' correctness
-    rcpts = args.to.split(",")
+    env['from'] = parse_address(args.from_)
+    msg['msg_from'] = args.from_
 
-    for rcpt in rcpts:
-        if not rcpt.count('@'):
-            arg_parser.error('Wrong "To" address')
-        elif not rcpt.count('<') and rcpt.strip().count(' '):
-            arg_parser.error('Wrong "To" address format ({0})'.format(rcpt.strip()))
-        elif rcpt.count('<') and not rcpt.count('>'):
-            arg_parser.error('Wrong "To" address format')
-        elif rcpt.count('>') and not rcpt.count('<'):
-            arg_parser.error('Wrong "To" address format')
-
-    if args.from_.count('<'):
-        env['from'] = args.from_.partition('<')[-1].rpartition('>')[0].strip()
-        msg['msg_from'] = args.from_
-    else:
-        env['from'] = args.from_
-        msg['msg_from'] = args.from_
+    if not env['from']:
+        arg_parser.error('Wrong "From" address format')
 
+    # checking arg 'to' correctness
     env['to'] = []
     msg['msg_to'] = []
 
-    for rcpt in rcpts:
-        if rcpt.count('<'):
-            _rcpt_addr = rcpt.partition('<')[-1].rpartition('>')[0].strip()
-            env['to'].append(_rcpt_addr.strip())
-            msg['msg_to'].append(rcpt)
-        else:
-            env['to'].append(rcpt.strip())
-            msg['msg_to'].append(rcpt)
+    for rcpt in args.to.split(","):
+        _rcpt_addr = parse_address(rcpt)
+        if not _rcpt_addr:
+            arg_parser.error('Wrong "To" address format ({0})'.format(rcpt.strip()))
+        env['to'].append(_rcpt_addr)
+        msg['msg_to'].append(rcpt)
 
     smtp['username'] = env['from'].split("@")[0]
     smtp['domain'] = env['from'].split("@")[1]
@@ -135,6 +131,28 @@ def main():
     else:
         msg['content'] = None
 
+    session = SMTPHandler(smtp['domain'])
+
+    # probing needs the relay before any message is built, otherwise connect while the messages are being built
+    if args.probe and not open_session(session, smtp):
+        sys.exit(2)
+
+    if args.preflight or args.probe:
+        logging.info("Pre-flight validation of {0} recipients".format(len(env['to'])))
+        validator = RecipientValidator(session=session)
+        rejected = validator.validate(env['from'], env['to'], probe=args.probe)
+
+        for rcpt, reason in rejected.items():
+            logging.warning("Dropping recipient {0}: {1}".format(rcpt, reason))
+
+        msg['msg_to'] = [msg_to for msg_to, rcpt in zip(msg['msg_to'], env['to']) if rcpt not in rejected]
+        env['to'] = [rcpt for rcpt in env['to'] if rcpt not in rejected]
+
+        if not env['to']:
+            logging.critical("No valid recipients left, exiting..")
+            session.close()
+            sys.exit(1)
+
     tasks = JoinableQueue()
     messages_ready_to_send = Queue()
 
@@ -166,20 +184,10 @@ def main():
     for i in range(msg_workers_count):
         tasks.put(None)
 
-    session = SMTPHandler(smtp['domain'])
-
-    if not session.connect():
-        logging.critical("Unable to connect any {0} MX server, exiting..".format(smtp['domain']))
+    if not session.session and not open_session(session, smtp):
         terminate_workers(msg_workers)
         sys.exit(2)
 
-    if smtp['password']:
-        if not session.authorize(smtp['username'], smtp['password']):
-            logging.critical("Cannot authorize user, maybe wrong password?")
-            session.close()
-            terminate_workers(msg_workers)
-            sys.exit(2)
-
     for msg in range(messages_num):
         msg_to_send = messages_ready_to_send.get()
 
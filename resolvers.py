@@ -1,8 +1,19 @@
 from urllib.error import URLError, HTTPError
 from xml.dom import minidom
-from dns import resolver
+from dns import resolver, exception
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
 import urllib.request
+import threading
 import logging
+import time
+
+# Returned by DNSResolverPool when the queried domain doesn't exist (NXDOMAIN), as opposed to None which means
+# the domain couldn't be resolved at all (timeout, SERVFAIL, ...)
+NOT_FOUND = object()
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
 
 
 def parse_thunderbird_autoconfig(xml_autoconfig):
@@ -76,19 +87,219 @@ def get_mx_from_isp(domain, _timeout=4):
     return mx_servers
 
 
-def get_mx_from_dns(domain):
+class TTLCache:
+    """
+    Thread-safe in-memory cache, every entry expires after its own TTL.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :return: tuple (hit, value), where hit is False if there is no valid entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return False, None
+            return True, entry[1]
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DNSCache(TTLCache):
+    """
+    Cache of DNS answers, entries expire after the record's TTL.
+    """
+    def __init__(self, max_ttl=300, negative_ttl=60):
+        """
+        :param max_ttl: upper bound (in seconds) for the lifetime of a positive answer
+        :param negative_ttl: lifetime (in seconds) of NXDOMAIN and empty answers
+        """
+        super().__init__()
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+
+    def get(self, domain, rdtype):
+        """
+        :return: tuple (hit, records), where hit is False if there is no valid entry
+        """
+        return super().get((domain, rdtype))
+
+    def put(self, domain, rdtype, records, ttl=None):
+        if records and records is not NOT_FOUND:
+            ttl = self.max_ttl if ttl is None else min(ttl, self.max_ttl)
+        else:
+            ttl = self.negative_ttl
+        super().put((domain, rdtype), records, ttl)
+
+
+class DNSResolverPool:
+    """
+    Resolves MX/A/AAAA records of many domains concurrently, reusing a fixed pool of configured resolvers.
+    """
+    def __init__(self, nameservers=None, port=53, concurrency=32, timeout=2, lifetime=4, retries=0, cache=None):
+        """
+        dnspython already retries across the nameservers within lifetime, so a single query takes at most
+        (retries + 1) * lifetime seconds, 4 s with the defaults.
+        :param nameservers: list of nameserver IP addresses, by default taken from the system configuration
+        :param port: nameservers port, useful when querying a local stub DNS server
+        :param concurrency: number of queries (and resolver objects) running at the same time
+        :param timeout: single nameserver query timeout in seconds
+        :param lifetime: total time in seconds spent on a single query attempt
+        :param retries: how many times the whole attempt is repeated after a timeout or nameservers failure
+        :param cache: DNSCache object, by default a new one is created
+        """
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.cache = cache if cache is not None else DNSCache()
+        self._resolvers = Queue()
+
+        for _ in range(self.concurrency):
+            _resolver = resolver.Resolver(configure=not nameservers)
+            if nameservers:
+                _resolver.nameservers = list(nameservers)
+            _resolver.port = port
+            _resolver.timeout = timeout
+            _resolver.lifetime = lifetime
+            self._resolvers.put(_resolver)
+
+        logging.debug("Initialized DNSResolverPool with {0} resolvers".format(self.concurrency))
+
+    def _query(self, domain, rdtype):
+        _resolver = self._resolvers.get()
+        try:
+            # dnspython >= 2.0 deprecates query() in favour of resolve()
+            _resolve = getattr(_resolver, 'resolve', _resolver.query)
+            for attempt in range(self.retries + 1):
+                try:
+                    return _resolve(domain, rdtype)
+                except (exception.Timeout, resolver.NoNameservers) as err:
+                    logging.debug("Query {0} {1} failed (attempt {2}/{3}), reason: {4}"
+                                  .format(domain, rdtype, attempt + 1, self.retries + 1, err))
+                    if attempt == self.retries:
+                        raise
+        finally:
+            self._resolvers.put(_resolver)
+
+    def resolve(self, domain, rdtype):
+        """
+        :param domain: a str FQDN
+        :param rdtype: record type, e.g. "MX", "A", "AAAA"
+        :return: list of records in the text form, an empty list if domain has no such records, NOT_FOUND if domain
+        doesn't exist or None if domain cannot be resolved (such failures are not cached)
+        """
+        domain = domain.strip().rstrip('.').lower()
+
+        hit, records = self.cache.get(domain, rdtype)
+        if hit:
+            logging.debug("Cached answer for {0} {1}: {2}".format(domain, rdtype, records))
+            return records
+
+        try:
+            answer = self._query(domain, rdtype)
+        except resolver.NXDOMAIN:
+            logging.info("Domain {0} doesn't exist".format(domain))
+            self.cache.put(domain, rdtype, NOT_FOUND)
+            return NOT_FOUND
+        except resolver.NoAnswer:
+            logging.debug("No {0} records for {1}".format(rdtype, domain))
+            self.cache.put(domain, rdtype, [])
+            return []
+        except exception.Timeout:
+            logging.warning("Unable to resolve {0} {1}, all attempts timed out".format(domain, rdtype))
+            return None
+        except exception.DNSException as err:
+            logging.warning("Unable to resolve {0} {1}, reason: {2}".format(domain, rdtype, err))
+            return None
+
+        records = [rdata.to_text() for rdata in answer]
+        self.cache.put(domain, rdtype, records, answer.rrset.ttl)
+        return records
+
+    def resolve_mx(self, domain):
+        """
+        :param domain: a str FQDN
+        :return: list of tuples (preference, hostname) sorted by preference, NOT_FOUND or None as returned by
+        resolve(). Null MX targets (".") are skipped, so a domain which doesn't accept mail gets an empty list.
+        """
+        records = self.resolve(domain, "MX")
+        if records is None or records is NOT_FOUND:
+            return records
+
+        mx_records = []
+        for record in records:
+            preference, hostname = record.split(" ")
+            hostname = hostname.rstrip('.')
+            if hostname:
+                mx_records.append((int(preference), hostname))
+        mx_records.sort()
+
+        return mx_records
+
+    def resolve_many(self, domains, rdtypes=("MX",)):
+        """
+        Resolves records of all given domains concurrently.
+        :param domains: iterable of str FQDNs
+        :param rdtypes: record types to resolve for every domain
+        :return: dict {domain: {rdtype: records}}, records as returned by resolve()
+        """
+        domains = {domain.strip().rstrip('.').lower() for domain in domains}
+        queries = [(domain, rdtype) for domain in domains for rdtype in rdtypes]
+        logging.debug("Resolving {0} queries for {1} domains".format(len(queries), len(domains)))
+
+        results = {domain: {} for domain in domains}
+        if not queries:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(queries))) as executor:
+            answers = executor.map(lambda query: self.resolve(*query), queries)
+            for (domain, rdtype), records in zip(queries, answers):
+                results[domain][rdtype] = records
+
+        return results
+
+
+def get_default_pool():
+    """
+    :return: module-wide DNSResolverPool, created on the first call
+    """
+    global _default_pool
+
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = DNSResolverPool(concurrency=4)
+
+    return _default_pool
+
+
+def get_mx_from_dns(domain, _pool=None):
+    """
+    Search for MX servers in the domain's DNS zone.
+    :param domain: a str FQDN
+    :param _pool: DNSResolverPool object used to query, by default the module-wide one
+    :return: List of dicts describing mx servers with commonly known SMTP ports
+    """
     mx_servers = []
 
-    try:
-        _tmp_mx = []
-        for mx in resolver.query(domain, "MX"):
-            _tmp_mx.append(mx.to_text().split(" "))
-        logging.info("Found {0} MX servers in DNS zone".format(len(_tmp_mx)))
-        _tmp_mx.sort()  # sort MX's by priority
-
-    except resolver.NXDOMAIN:
-        logging.error("Cannot resolve domain name ".format(domain))
+    if _pool is None:
+        _pool = get_default_pool()
+
+    _tmp_mx = _pool.resolve_mx(domain)
+    if not _tmp_mx or _tmp_mx is NOT_FOUND:
+        logging.error("Cannot resolve domain name {0}".format(domain))
         return None
+    logging.info("Found {0} MX servers in DNS zone".format(len(_tmp_mx)))
 
     for mx in _tmp_mx:
         for port in (587, 465, 25):  # Adding commonly known SMTP ports
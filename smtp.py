@@ -3,12 +3,30 @@ import logging
 from _socket import timeout
 from resolvers import get_mx_from_ispdb, get_mx_from_isp, get_mx_from_dns
 from socket import getdefaulttimeout
+import re
 
 smtp_ports = {'all': (587, 465, 25),
               'starttls': (587, 25),
               'ssl': (465,),
               'plain': (587, 25)}
 
+# RFC 3463 enhanced status code at the beginning of a reply text, e.g. "5.1.1"
+enhanced_status_re = re.compile(rb"^\s*([245])\.(\d{1,3})\.\d{1,3}\b")
+
+
+def is_mailbox_rejection(response):
+    """
+    Tells apart replies rejecting the mailbox itself from policy ones (relay denied, authentication required, rate
+    limits...), which say nothing about the recipient address.
+    :param response: tuple (code, message) as returned by smtplib
+    :return: True if the recipient mailbox is permanently rejected
+    """
+    code, message = response
+    status = enhanced_status_re.match(message or b'')
+    if status:
+        return status.group(1) == b'5' and status.group(2) == b'1'
+    return code in (550, 551, 553)
+
 
 class SMTPHandler:
     def __init__(self, domain):
@@ -208,6 +226,58 @@ class SMTPHandler:
         logging.info("Mail sent successful")
         return True
 
+    def probe_rcpts(self, env_from, env_to, batch_size=50):
+        """
+        Checks whether the server accepts recipients without sending any message. Recipients are probed in batches,
+        each batch within its own "MAIL FROM" transaction which is then aborted with "RSET".
+        :param env_from: e-mail address which will be a SMTP MAIL FROM parameter
+        :param env_to: list of e-mail addresses to probe
+        :param batch_size: max number of RCPT TO commands within a single transaction
+        :return: dict {rcpt: (code, response)} or None if probing isn't possible. Probing stops at the first policy
+        rejection (see is_mailbox_rejection()) or when the server closes the connection, then responses collected
+        so far are returned.
+        """
+        if not self.session:
+            logging.debug("Cannot probe recipients, when connection isn't established")
+            return None
+
+        responses = {}
+
+        try:
+            for batch_start in range(0, len(env_to), batch_size):
+                batch = env_to[batch_start:batch_start + batch_size]
+
+                logging.debug("Sending cmd MAIL FROM: {0}".format(env_from))
+                _mail_from_response = self.session.mail(env_from)
+                logging.debug("MAIL FROM response: {0}".format(_mail_from_response))
+
+                if _mail_from_response[0] != 250:
+                    logging.error('Remote server replied "{0}" in response to "MAIL FROM" '
+                                  'command'.format(_mail_from_response))
+                    self.session.rset()
+                    return responses or None
+
+                for rcpt in batch:
+                    logging.debug("Sending cmd RCPT TO: {0}".format(rcpt))
+                    responses[rcpt] = self.session.rcpt(rcpt)
+                    logging.debug("RCPT To response: {0}".format(responses[rcpt]))
+
+                    if responses[rcpt][0] >= 500 and not is_mailbox_rejection(responses[rcpt]):
+                        logging.warning('Remote server replied "{0}" in response to "RCPT TO" command, '
+                                        'stopping recipients probing'.format(responses[rcpt]))
+                        self.session.rset()
+                        return responses
+
+                logging.debug("Sending cmd RSET")
+                _rset_response = self.session.rset()
+                logging.debug("RSET response: {0}".format(_rset_response))
+        except smtplib.SMTPServerDisconnected:
+            logging.warning("SMTP server closed the connection after {0} probed recipients".format(len(responses)))
+            self.session = None
+            return responses
+
+        return responses
+
     def close(self):
 
         if self.session:
@@ -0,0 +1,124 @@
+import socket
+import threading
+import unittest
+from unittest import mock
+
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+import resolvers
+from resolvers import DNSCache, DNSResolverPool, NOT_FOUND, get_mx_from_dns
+
+
+class StubDNSServer:
+    """
+    Minimal UDP DNS server answering from a dict {name: {rdtype: [records]}}. Names listed in "nxdomain" get
+    NXDOMAIN and names (or (name, rdtype) tuples) listed in "silent" never get any reply.
+    """
+    def __init__(self, zone, nxdomain=(), silent=(), ttl=60):
+        self.zone = zone
+        self.nxdomain = set(nxdomain)
+        self.silent = set(silent)
+        self.ttl = ttl
+        self.queries = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            self.queries += 1
+            query = dns.message.from_wire(data)
+            question = query.question[0]
+            name = question.name.to_text().rstrip('.')
+            rdtype = dns.rdatatype.to_text(question.rdtype)
+            if name in self.silent or (name, rdtype) in self.silent:
+                continue
+
+            response = dns.message.make_response(query)
+            if name in self.nxdomain:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            else:
+                records = self.zone.get(name, {}).get(rdtype)
+                if records:
+                    response.answer.append(dns.rrset.from_text_list(question.name, self.ttl, 'IN', rdtype,
+                                                                    records))
+            self.sock.sendto(response.to_wire(), addr)
+
+    def pool(self, **kwargs):
+        kwargs.setdefault('timeout', 0.2)
+        kwargs.setdefault('lifetime', 0.2)
+        kwargs.setdefault('retries', 1)
+        return DNSResolverPool(nameservers=['127.0.0.1'], port=self.port, **kwargs)
+
+    def close(self):
+        self.sock.close()
+
+
+class DNSResolverPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubDNSServer({'example.test': {'MX': ['20 mx2.example.test.', '10 mx1.example.test.']},
+                                     'nullmx.test': {'MX': ['0 .']}},
+                                    nxdomain=['missing.test'], silent=['slow.test'])
+        self.pool = self.server.pool()
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_resolve_many(self):
+        results = self.pool.resolve_many(['example.test', 'Nullmx.test.', 'missing.test', 'slow.test'])
+
+        self.assertEqual(sorted(results['example.test']['MX']), ['10 mx1.example.test.', '20 mx2.example.test.'])
+        self.assertEqual(results['nullmx.test']['MX'], ['0 .'])
+        self.assertIs(results['missing.test']['MX'], NOT_FOUND)
+        self.assertIsNone(results['slow.test']['MX'])
+
+    def test_failures_are_not_cached(self):
+        self.pool.resolve('slow.test', 'MX')
+        self.assertEqual(self.pool.cache.get('slow.test', 'MX'), (False, None))
+
+        self.pool.resolve('example.test', 'MX')
+        queries = self.server.queries
+        self.pool.resolve('example.test', 'MX')
+        self.assertEqual(self.server.queries, queries)
+
+    def test_resolve_mx(self):
+        self.assertEqual(self.pool.resolve_mx('example.test'), [(10, 'mx1.example.test'), (20, 'mx2.example.test')])
+        self.assertEqual(self.pool.resolve_mx('nullmx.test'), [])
+
+    def test_get_mx_from_dns(self):
+        mx_servers = get_mx_from_dns('example.test', self.pool)
+        self.assertEqual(mx_servers[0]['hostname'], 'mx1.example.test')
+        self.assertEqual(len(mx_servers), 6)
+
+        self.assertIsNone(get_mx_from_dns('nullmx.test', self.pool))
+        self.assertIsNone(get_mx_from_dns('missing.test', self.pool))
+        self.assertIsNone(get_mx_from_dns('slow.test', self.pool))
+
+
+class DNSCacheTest(unittest.TestCase):
+    def test_ttl_expiry(self):
+        cache = DNSCache(max_ttl=300, negative_ttl=10)
+
+        with mock.patch.object(resolvers.time, 'monotonic', return_value=1000.0):
+            cache.put('example.test', 'MX', ['10 mx.example.test.'], ttl=30)
+            cache.put('missing.test', 'MX', NOT_FOUND)
+
+        with mock.patch.object(resolvers.time, 'monotonic', return_value=1015.0):
+            self.assertEqual(cache.get('example.test', 'MX'), (True, ['10 mx.example.test.']))
+            self.assertEqual(cache.get('missing.test', 'MX'), (False, None))
+
+        with mock.patch.object(resolvers.time, 'monotonic', return_value=1031.0):
+            self.assertEqual(cache.get('example.test', 'MX'), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import smtplib
+import unittest
+
+from smtp import SMTPHandler, is_mailbox_rejection
+from test_resolvers import StubDNSServer
+from validators import RecipientValidator, parse_address
+
+
+class FakeSMTP:
+    """
+    Stands for smtplib.SMTP, replies to RCPT TO according to the recipient prefix ("bad" - unknown user, "policy" -
+    relay denied), refuses MAIL FROM number "mail_fail_at" and disconnects on the RCPT TO number
+    "disconnect_after" + 1.
+    """
+    def __init__(self, disconnect_after=None, mail_fail_at=None):
+        self.disconnect_after = disconnect_after
+        self.mail_fail_at = mail_fail_at
+        self.commands = []
+
+    def mail(self, sender):
+        self.commands.append('MAIL')
+        if self.commands.count('MAIL') == self.mail_fail_at:
+            return 451, b'4.3.0 Try again later'
+        return 250, b'OK'
+
+    def rcpt(self, rcpt):
+        if self.commands.count('RCPT') == self.disconnect_after:
+            raise smtplib.SMTPServerDisconnected
+        self.commands.append('RCPT')
+        if rcpt.startswith('bad'):
+            return 550, b'5.1.1 No such user'
+        if rcpt.startswith('policy'):
+            return 554, b'5.7.1 Relay access denied'
+        return 250, b'OK'
+
+    def rset(self):
+        self.commands.append('RSET')
+        return 250, b'OK'
+
+
+class ParseAddressTest(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(parse_address('user@example.com'), 'user@example.com')
+        self.assertEqual(parse_address(' Common Name <user@example.com>'), 'user@example.com')
+        self.assertEqual(parse_address('user@[192.0.2.1]'), 'user@[192.0.2.1]')
+        self.assertIsNone(parse_address('common name user@example.com'))
+        self.assertIsNone(parse_address('<user@example.com'))
+        self.assertIsNone(parse_address('user.example.com'))
+
+
+class MailboxRejectionTest(unittest.TestCase):
+    def test_is_mailbox_rejection(self):
+        self.assertTrue(is_mailbox_rejection((550, b'5.1.1 No such user')))
+        self.assertTrue(is_mailbox_rejection((553, b'Mailbox name not allowed')))
+        self.assertFalse(is_mailbox_rejection((550, b'5.7.1 Rate limited')))
+        self.assertFalse(is_mailbox_rejection((530, b'5.7.0 Authentication required')))
+        self.assertFalse(is_mailbox_rejection((554, b'Relay access denied')))
+        self.assertFalse(is_mailbox_rejection((450, b'4.1.1 Try again later')))
+
+
+class RecipientValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubDNSServer({'mx.test': {'MX': ['10 mail.mx.test.']},
+                                     'nullmx.test': {'MX': ['0 .']},
+                                     'implicit.test': {'A': ['192.0.2.1']},
+                                     'nomail.test': {'TXT': ['"v=spf1 -all"']}},
+                                    nxdomain=['missing.test'], silent=['slow.test', ('implicit.test', 'AAAA')])
+        self.validator = RecipientValidator(pool=self.server.pool())
+
+    def tearDown(self):
+        self.server.close()
+
+    def cached(self, rcpt):
+        return self.validator.cache.get(self.validator.cache_key(rcpt))
+
+    def probing_session(self, **kwargs):
+        session = SMTPHandler('mx.test')
+        session.session = FakeSMTP(**kwargs)
+        self.validator.session = session
+        return session
+
+    def test_check_domains(self):
+        bad_domains = self.validator.check_domains(['mx.test', 'nullmx.test', 'implicit.test', 'nomail.test',
+                                                    'missing.test', 'slow.test'])
+
+        self.assertEqual(sorted(bad_domains), ['missing.test', 'nomail.test', 'nullmx.test'])
+
+    def test_lookup_failure_keeps_recipient(self):
+        self.assertEqual(self.validator.validate('me@mx.test', ['x@slow.test']), {})
+        self.assertEqual(self.cached('x@slow.test'), (False, None))
+
+        self.assertEqual(list(self.validator.validate('me@mx.test', ['x@missing.test'])), ['x@missing.test'])
+        self.assertTrue(self.cached('x@missing.test')[0])
+
+    def test_bare_addresses_only(self):
+        rejected = self.validator.validate('me@mx.test', ['Name <x@mx.test>'], check_domains=False)
+        self.assertEqual(rejected, {'Name <x@mx.test>': "wrong address format"})
+
+    def test_cache_key_keeps_local_part_case(self):
+        self.validator.validate('me@mx.test', ['Bob@MISSING.test'])
+
+        self.assertTrue(self.cached('Bob@missing.test')[0])
+        self.assertEqual(self.cached('bob@missing.test'), (False, None))
+
+    def test_probe_in_batches(self):
+        session = self.probing_session()
+        self.validator.probe_batch_size = 2
+
+        rejected = self.validator.validate('me@mx.test', ['a@mx.test', 'bad@mx.test', 'c@mx.test'], probe=True)
+
+        self.assertEqual(list(rejected), ['bad@mx.test'])
+        self.assertEqual(session.session.commands, ['MAIL', 'RCPT', 'RCPT', 'RSET', 'MAIL', 'RCPT', 'RSET'])
+
+    def test_probe_stops_on_policy_rejection(self):
+        session = self.probing_session()
+
+        rejected = self.validator.validate('me@mx.test', ['bad@mx.test', 'policy@mx.test', 'c@mx.test'],
+                                           probe=True)
+
+        self.assertEqual(list(rejected), ['bad@mx.test'])
+        self.assertEqual(session.session.commands, ['MAIL', 'RCPT', 'RCPT', 'RSET'])
+        self.assertEqual(self.cached('policy@mx.test'), (False, None))
+
+    def test_probe_keeps_earlier_batches_on_mail_from_failure(self):
+        self.probing_session(mail_fail_at=2)
+        self.validator.probe_batch_size = 2
+
+        rejected = self.validator.validate('me@mx.test', ['a@mx.test', 'bad@mx.test', 'c@mx.test'], probe=True)
+
+        self.assertEqual(list(rejected), ['bad@mx.test'])
+        self.assertEqual(self.cached('c@mx.test'), (False, None))
+
+    def test_probe_disconnect_keeps_partial_results(self):
+        session = self.probing_session(disconnect_after=2)
+
+        rejected = self.validator.validate('me@mx.test', ['a@mx.test', 'bad@mx.test', 'c@mx.test'], probe=True)
+
+        self.assertEqual(list(rejected), ['bad@mx.test'])
+        self.assertIsNone(session.session)
+        self.assertEqual(self.cached('c@mx.test'), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
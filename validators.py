@@ -0,0 +1,148 @@
+from resolvers import DNSResolverPool, TTLCache, NOT_FOUND
+from smtp import is_mailbox_rejection
+import logging
+import re
+
+_atext = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+"
+_label = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+_addr_spec = r"{0}(?:\.{0})*@(?:(?:{1}\.)*{1}\.?|\[[^\[\]\s]+\])".format(_atext, _label)
+
+addr_spec_re = re.compile(r"^{0}$".format(_addr_spec))
+
+# Either bare "user@example.com" or "Common Name <user@example.com>"
+mailbox_re = re.compile(r"^\s*(?:(?P<bare>{0})|[^<>]*<\s*(?P<addr>{0})\s*>)\s*$".format(_addr_spec))
+
+
+def parse_address(mailbox):
+    """
+    :param mailbox: str in the form "user@example.com" or "Common Name <user@example.com>"
+    :return: the bare e-mail address or None if the mailbox syntax is wrong
+    """
+    match = mailbox_re.match(mailbox)
+    if not match:
+        return None
+    return match.group('bare') or match.group('addr')
+
+
+class RecipientValidator:
+    """
+    Pre-flight recipients check: address syntax, recipient domains MX records and optionally RCPT TO probing
+    on the relay. Results are cached, which only helps callers validating several batches with the same validator
+    object; a single validate() call, as made by the command line tool, never hits the cache.
+    """
+    def __init__(self, pool=None, session=None, cache_ttl=3600, probe_batch_size=50):
+        """
+        :param pool: DNSResolverPool object, by default a new one is created
+        :param session: connected SMTPHandler object, required only for probing
+        :param cache_ttl: lifetime (in seconds) of the cached results
+        :param probe_batch_size: number of RCPT TO commands within a single probing transaction
+        """
+        self.pool = pool if pool is not None else DNSResolverPool()
+        self.session = session
+        self.cache_ttl = cache_ttl
+        self.probe_batch_size = probe_batch_size
+        self.cache = TTLCache()
+
+    @staticmethod
+    def cache_key(rcpt):
+        """
+        Only the domain is case-insensitive, local parts are not (RFC 5321 section 2.4).
+        """
+        local, _, domain = rcpt.rpartition('@')
+        return local + '@' + domain.rstrip('.').lower()
+
+    def check_domains(self, domains):
+        """
+        Resolves all domains concurrently, a domain without MX records is still deliverable if it has an A or AAAA
+        record (implicit MX). Domains which couldn't be resolved (timeout, SERVFAIL, ...) are not reported.
+        :param domains: iterable of str FQDNs
+        :return: dict {domain: reason} of undeliverable domains
+        """
+        bad_domains = {}
+        no_mx = []
+
+        for domain, records in self.pool.resolve_many(domains, ("MX",)).items():
+            mx_records = records["MX"]
+            if mx_records is None:
+                logging.warning("Unable to check MX records of {0}, keeping its recipients".format(domain))
+            elif mx_records is NOT_FOUND:
+                bad_domains[domain] = "domain doesn't exist"
+            elif not mx_records:
+                no_mx.append(domain)
+            elif all(record.split(" ")[1] == "." for record in mx_records):
+                bad_domains[domain] = "domain doesn't accept mail (null MX)"
+
+        if no_mx:
+            for domain, records in self.pool.resolve_many(no_mx, ("A", "AAAA")).items():
+                answers = [records["A"], records["AAAA"]]
+                if any(answer and answer is not NOT_FOUND for answer in answers):
+                    continue
+                elif None in answers:
+                    logging.warning("Unable to check A/AAAA records of {0}, keeping its recipients".format(domain))
+                else:
+                    bad_domains[domain] = "domain has no MX records"
+
+        return bad_domains
+
+    def probe(self, env_from, rcpts):
+        """
+        :return: dict {rcpt: (code, response)} of the probed recipients, possibly not all of them if the relay
+        refused probing or closed the connection, or None if probing isn't possible
+        """
+        if not self.session:
+            logging.debug("Cannot probe recipients, when connection isn't established")
+            return None
+
+        responses = self.session.probe_rcpts(env_from, rcpts, self.probe_batch_size)
+        if responses is None:
+            logging.warning("Recipients probing is not possible, skipping")
+
+        return responses
+
+    def validate(self, env_from, rcpts, check_domains=True, probe=False):
+        """
+        :param env_from: e-mail address used as a MAIL FROM parameter while probing
+        :param rcpts: list of bare recipients e-mail addresses
+        :param check_domains: whether to check recipient domains MX records
+        :param probe: whether to probe the recipients with RCPT TO on the relay
+        :return: dict {rcpt: reason} of rejected recipients
+        """
+        rejected = {}
+        unknown = []
+
+        for rcpt in dict.fromkeys(rcpts):  # drop duplicates, keep order
+            hit, reason = self.cache.get(self.cache_key(rcpt))
+            if hit:
+                if reason:
+                    rejected[rcpt] = reason
+            elif not addr_spec_re.match(rcpt):
+                rejected[rcpt] = "wrong address format"
+            else:
+                unknown.append(rcpt)
+
+        if check_domains and unknown:
+            # address literals like user@[192.0.2.1] don't need resolving
+            domains = {rcpt: rcpt.rpartition('@')[2].rstrip('.').lower() for rcpt in unknown
+                       if not rcpt.endswith(']')}
+            bad_domains = self.check_domains(set(domains.values()))
+            for rcpt, domain in domains.items():
+                if domain in bad_domains:
+                    rejected[rcpt] = bad_domains[domain]
+            unknown = [rcpt for rcpt in unknown if rcpt not in rejected]
+
+        accepted = []
+        if probe and unknown:
+            # policy rejections (relay denied, authentication required...) keep the recipient, like 4xx replies
+            for rcpt, response in (self.probe(env_from, unknown) or {}).items():
+                if is_mailbox_rejection(response):
+                    rejected[rcpt] = 'relay replied "{0}"'.format(response)
+                elif response[0] < 300:
+                    accepted.append(rcpt)
+
+        # Accepted addresses are remembered only once the relay has confirmed them
+        for rcpt in rejected:
+            self.cache.put(self.cache_key(rcpt), rejected[rcpt], self.cache_ttl)
+        for rcpt in accepted:
+            self.cache.put(self.cache_key(rcpt), None, self.cache_ttl)
+
+        return rejected